@@ -1,40 +1,178 @@
 #!/usr/bin/env python3
-from flask import Flask, jsonify, request, abort
+from flask import Flask, Response, g, jsonify, request, abort
 from flask_cors import CORS
+import platform
+import queue
+import re
 import sqlite3
-from contextlib import closing
+import threading
+from contextlib import closing, contextmanager
 from functools import wraps
+from db import STATS_COLS, STUDENT_COLS, configure
+
+try:
+    from orjson import dumps as json_dumps
+except ImportError:  # orjson has no PyPy build; fall back to the stdlib
+    import json
+
+    def json_dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode()
 
 app = Flask(__name__)
 CORS(app)  # Allow cross-origin requests for teaching purposes
 
-# Database helper function (functional approach)
+# Compiled once; rejects malformed emails before they reach the database
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# SQL text kept in constants so the statement cache always sees the same key
+SQL_LIST_STUDENTS = 'SELECT * FROM students ORDER BY name'
+SQL_FILTER_STUDENTS = 'SELECT * FROM students WHERE grade >= ? ORDER BY grade DESC'
+SQL_GET_STUDENT = 'SELECT * FROM students WHERE id = ?'
+SQL_INSERT_STUDENT = '''
+    INSERT INTO students (name, email, grade) VALUES (?, ?, ?)
+    ON CONFLICT(email) DO NOTHING
+    RETURNING id
+'''
+SQL_UPDATE_STUDENT = 'UPDATE students SET name = ?, email = ?, grade = ? WHERE id = ?'
+SQL_DELETE_STUDENT = 'DELETE FROM students WHERE id = ?'
+SQL_STATISTICS = '''
+    SELECT
+        COUNT(*) as total_students,
+        AVG(grade) as average_grade,
+        MAX(grade) as highest_grade,
+        MIN(grade) as lowest_grade,
+        IFNULL(SUM(grade >= 90), 0) as a_students,
+        IFNULL(SUM(grade >= 80 AND grade < 90), 0) as b_students,
+        IFNULL(SUM(grade >= 70 AND grade < 80), 0) as c_students,
+        IFNULL(SUM(grade < 70), 0) as failing_students
+    FROM students
+'''
+
+# Idle connections shared by all request threads; each request checks one
+# out and gives it back in teardown, so even the dev server (a new thread
+# per request) reuses open connections
+POOL_SIZE = 8
+_pool = queue.LifoQueue(maxsize=POOL_SIZE)
+
+# Encoded /api/statistics body, valid while _stats_conn sees the same
+# data_version; the dedicated connection never writes, so every commit
+# (from any thread or process) moves its data_version
+_stats_lock = threading.Lock()
+_stats_conn = None
+_stats_cache = None
+
+# Database helper functions (functional approach)
+def open_conn(**kwargs):
+    """Open a configured, long-lived API connection"""
+    # Autocommit mode; prepared statements are reused from the cache
+    conn = configure(sqlite3.connect(
+        'database.db', cached_statements=256, isolation_level=None, **kwargs
+    ))
+    # Long-lived connection: serve reads from a memory map and a large cache
+    conn.execute('PRAGMA mmap_size=268435456')  # 256 MiB
+    conn.execute('PRAGMA cache_size=-65536')  # 64 MiB
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
+def get_conn():
+    """Return this request's connection, checking one out of the pool"""
+    if 'db' not in g:
+        try:
+            g.db = _pool.get_nowait()
+        except queue.Empty:
+            g.db = open_conn(check_same_thread=False)
+    return g.db
+
 def query_db(query, args=(), one=False):
-    """Execute a query and return results as dictionaries"""
-    with closing(sqlite3.connect('database.db')) as conn:
-        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-        cursor = conn.execute(query, args)
-        rows = cursor.fetchall()
-        return (rows[0] if rows else None) if one else rows
+    """Execute a query and return results as plain tuples"""
+    rows = get_conn().execute(query, args).fetchall()
+    return (rows[0] if rows else None) if one else rows
+
+def dict_from_row(row, cols=STUDENT_COLS):
+    """Convert a tuple row to a dictionary keyed by column name"""
+    return dict(zip(cols, row)) if row else None
+
+@contextmanager
+def write_transaction():
+    """Run the enclosed writes in one explicit BEGIN IMMEDIATE ... COMMIT"""
+    # Reads run in autocommit mode; only writes pay for a transaction, and
+    # IMMEDIATE takes the write lock up front instead of upgrading mid-way
+    conn = get_conn()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+@app.teardown_appcontext
+def release_db(exception):
+    """Discard anything the request left uncommitted and return its connection"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        release_conn(conn)
+
+def release_conn(conn):
+    """Roll back any open transaction and put conn back in the pool"""
+    conn.rollback()
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+def close_all_conns():
+    """Close every idle connection (e.g. before a gunicorn fork)"""
+    global _stats_conn, _stats_cache
+    while True:
+        try:
+            _pool.get_nowait().close()
+        except queue.Empty:
+            break
+    with _stats_lock:
+        if _stats_conn is not None:
+            _stats_conn.close()
+            _stats_conn = _stats_cache = None
 
-def dict_from_row(row):
-    """Convert sqlite3.Row to dictionary"""
-    return dict(row) if row else None
+def json_response(payload):
+    """Encode payload once and send it as a JSON response"""
+    # orjson encodes far faster than jsonify's json
+    return raw_json_response(json_dumps(payload))
+
+def raw_json_response(body):
+    """Send already-encoded JSON bytes"""
+    return Response(body, mimetype='application/json')
 
 # Input validation decorator (functional programming style)
 def validate_json(*required_fields):
+    required_set = frozenset(required_fields)
+
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            if not request.json:
+            # Parse once; handlers read the result from g.data
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict) or not data:
                 abort(400, description="No JSON data provided")
-            for field in required_fields:
-                if field not in request.json:
-                    abort(400, description=f"Missing required field: {field}")
+            missing = required_set - data.keys()
+            if missing:
+                field = next(name for name in required_fields if name in missing)
+                abort(400, description=f"Missing required field: {field}")
+            g.data = data
             return f(*args, **kwargs)
         return wrapper
     return decorator
 
+def validate_student(data):
+    """Reject a bad name, grade or email with a 400 before touching the database"""
+    if not isinstance(data['name'], str) or not data['name'].strip():
+        abort(400, description="Name must be a non-empty string")
+    grade = data['grade']
+    if isinstance(grade, bool) or not isinstance(grade, int) or not 0 <= grade <= 100:
+        abort(400, description="Grade must be an integer between 0 and 100")
+    if not isinstance(data['email'], str) or not EMAIL_RE.match(data['email']):
+        abort(400, description="Invalid email address")
+
 # --- API ROUTES ---
 
 @app.route('/api/students', methods=['GET'])
@@ -43,105 +181,126 @@ def get_students():
     min_grade = request.args.get('min_grade', type=int)
 
     if min_grade is not None:
-        students = query_db(
-            'SELECT * FROM students WHERE grade >= ? ORDER BY grade DESC',
-            [min_grade]
-        )
+        cursor = get_conn().execute(SQL_FILTER_STUDENTS, [min_grade])
     else:
-        students = query_db('SELECT * FROM students ORDER BY name')
+        cursor = get_conn().execute(SQL_LIST_STUDENTS)
+    cursor.arraysize = 1000
+    # The request is torn down before the body is sent, so the response
+    # takes over the connection instead of release_db
+    conn = g.pop('db')
+
+    def generate():
+        # Emit the JSON array one batch of rows at a time instead of
+        # building the whole list in memory first
+        try:
+            yield b'['
+            sep = b''
+            while batch := cursor.fetchmany():
+                yield sep + b','.join(json_dumps(dict(zip(STUDENT_COLS, s))) for s in batch)
+                sep = b','
+            yield b']'
+        finally:
+            # Also runs if the client disconnects mid-stream, so the half-read
+            # SELECT doesn't keep a WAL read snapshot pinned
+            cursor.close()
+
+    def finish():
+        # The WSGI server closes every response, even one whose body was
+        # never iterated, so this always hands the connection back
+        cursor.close()
+        release_conn(conn)
 
-    return jsonify([dict_from_row(s) for s in students])
+    response = Response(generate(), mimetype='application/json')
+    response.call_on_close(finish)
+    return response
 
 @app.route('/api/students/<int:student_id>', methods=['GET'])
 def get_student(student_id):
     """Get a specific student by ID"""
-    student = query_db(
-        'SELECT * FROM students WHERE id = ?',
-        [student_id],
-        one=True
-    )
+    student = query_db(SQL_GET_STUDENT, [student_id], one=True)
 
     if not student:
         abort(404, description="Student not found")
 
-    return jsonify(dict_from_row(student))
+    return json_response(dict_from_row(student))
 
 @app.route('/api/students', methods=['POST'])
 @validate_json('name', 'email', 'grade')
 def create_student():
     """Create a new student"""
-    data = request.json
-
-    # Validate grade range
-    if not 0 <= data['grade'] <= 100:
-        abort(400, description="Grade must be between 0 and 100")
+    data = g.data
+    validate_student(data)
 
     try:
-        with closing(sqlite3.connect('database.db')) as conn:
-            cursor = conn.execute(
-                'INSERT INTO students (name, email, grade) VALUES (?, ?, ?)',
+        with write_transaction() as conn:
+            row = conn.execute(
+                SQL_INSERT_STUDENT,
                 [data['name'], data['email'], data['grade']]
-            )
-            conn.commit()
-            student_id = cursor.lastrowid
+            ).fetchone()
+    except sqlite3.IntegrityError:
+        # Email conflicts never get here (ON CONFLICT); this covers the
+        # other constraints should a value slip past validate_student
+        abort(400, description="Invalid student data")
 
-        # Return the created student
-        return jsonify({
-            'id': student_id,
-            'message': 'Student created successfully'
-        }), 201
-
-    except sqlite3.IntegrityError as e:
+    # ON CONFLICT DO NOTHING returns no row for a duplicate email
+    if row is None:
         abort(400, description="Email already exists")
 
+    # Return the created student
+    return jsonify({
+        'id': row[0],
+        'message': 'Student created successfully'
+    }), 201
+
 @app.route('/api/students/<int:student_id>', methods=['PUT'])
 @validate_json('name', 'email', 'grade')
 def update_student(student_id):
     """Update an existing student"""
-    data = request.json
+    data = g.data
+    validate_student(data)
 
-    # Check if student exists
-    if not query_db('SELECT id FROM students WHERE id = ?', [student_id], one=True):
-        abort(404, description="Student not found")
+    try:
+        with write_transaction() as conn:
+            cursor = conn.execute(
+                SQL_UPDATE_STUDENT,
+                [data['name'], data['email'], data['grade'], student_id]
+            )
+    except sqlite3.IntegrityError as e:
+        if 'students.email' in str(e):
+            abort(400, description="Email already exists")
+        abort(400, description="Invalid student data")
 
-    with closing(sqlite3.connect('database.db')) as conn:
-        conn.execute(
-            'UPDATE students SET name = ?, email = ?, grade = ? WHERE id = ?',
-            [data['name'], data['email'], data['grade'], student_id]
-        )
-        conn.commit()
+    # No matching row means the student does not exist
+    if cursor.rowcount == 0:
+        abort(404, description="Student not found")
 
     return jsonify({'message': 'Student updated successfully'})
 
 @app.route('/api/students/<int:student_id>', methods=['DELETE'])
 def delete_student(student_id):
     """Delete a student"""
-    with closing(sqlite3.connect('database.db')) as conn:
-        cursor = conn.execute('DELETE FROM students WHERE id = ?', [student_id])
-        conn.commit()
+    with write_transaction() as conn:
+        cursor = conn.execute(SQL_DELETE_STUDENT, [student_id])
 
-        if cursor.rowcount == 0:
-            abort(404, description="Student not found")
+    if cursor.rowcount == 0:
+        abort(404, description="Student not found")
 
     return jsonify({'message': 'Student deleted successfully'})
 
 @app.route('/api/statistics', methods=['GET'])
 def get_statistics():
     """Get grade statistics (functional approach with SQL aggregation)"""
-    stats = query_db('''
-        SELECT
-            COUNT(*) as total_students,
-            AVG(grade) as average_grade,
-            MAX(grade) as highest_grade,
-            MIN(grade) as lowest_grade,
-            COUNT(CASE WHEN grade >= 90 THEN 1 END) as a_students,
-            COUNT(CASE WHEN grade >= 80 AND grade < 90 THEN 1 END) as b_students,
-            COUNT(CASE WHEN grade >= 70 AND grade < 80 THEN 1 END) as c_students,
-            COUNT(CASE WHEN grade < 70 THEN 1 END) as failing_students
-        FROM students
-    ''', one=True)
-
-    return jsonify(dict_from_row(stats))
+    global _stats_conn, _stats_cache
+    with _stats_lock:
+        if _stats_conn is None:
+            _stats_conn = open_conn(check_same_thread=False)
+        version = _stats_conn.execute('PRAGMA data_version').fetchone()[0]
+        if _stats_cache is None or _stats_cache[0] != version:
+            stats = _stats_conn.execute(SQL_STATISTICS).fetchone()
+            _stats_cache = (version, json_dumps(dict_from_row(stats, STATS_COLS)))
+        body = _stats_cache[1]
+
+    return raw_json_response(body)
 
 # Error handlers
 @app.errorhandler(400)
@@ -152,5 +311,33 @@ def handle_error(error):
         'status': error.code
     }), error.code
 
+def students_table_exists():
+    """Check for an initialised database without creating the file"""
+    try:
+        with closing(sqlite3.connect('file:database.db?mode=ro', uri=True)) as conn:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'students'"
+            ).fetchone() is not None
+    except sqlite3.OperationalError:
+        return False
+
+def warm_up(requests=1000):
+    """Exercise the list endpoint so PyPy's JIT compiles it before real traffic"""
+    # Nothing to warm up until init_db.py has run
+    if not students_table_exists():
+        return
+    with app.test_client() as client:
+        for _ in range(requests):
+            response = client.get('/api/students')
+            response.get_data()  # Drain the streamed body so the generator runs
+            response.close()  # Returns the list endpoint's connection to the pool
+            if response.status_code != 200:
+                break
+    # Don't let the warm-up connections leak into a forked gunicorn worker
+    close_all_conns()
+
+if platform.python_implementation() == 'PyPy':
+    warm_up()
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Shared SQLite connection settings
+Used by init_db.py, backend.py and student_manager.py
+"""
+
+# Column order of `SELECT * FROM students` and of the statistics query,
+# used to name plain tuple rows
+STUDENT_COLS = ('id', 'name', 'email', 'grade', 'created_at')
+STATS_COLS = (
+    'total_students', 'average_grade', 'highest_grade', 'lowest_grade',
+    'a_students', 'b_students', 'c_students', 'failing_students'
+)
+
+
+def configure(conn):
+    """Apply per-connection PRAGMAs and return the connection"""
+    # WAL lets readers and a writer work concurrently; NORMAL sync is safe in WAL
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    # Wait for a lock instead of failing straight away with "database is locked"
+    conn.execute('PRAGMA busy_timeout=30000')
+    return conn
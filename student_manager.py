@@ -3,30 +3,31 @@
 Simple Student Management System - MVP
 Uses native Python + SQLite (no Flask, no web interface)
 """
+import csv
 import sqlite3
+import sys
 from contextlib import closing
+from db import STATS_COLS, STUDENT_COLS, configure
 
 
 def connect_db():
     """Create a database connection"""
-    return sqlite3.connect('database.db')
+    return configure(sqlite3.connect('database.db'))
 
 
 def get_all_students():
     """Retrieve all students from the database"""
     with closing(connect_db()) as conn:
-        conn.row_factory = sqlite3.Row
         cursor = conn.execute('SELECT * FROM students ORDER BY name')
-        return [dict(row) for row in cursor.fetchall()]
+        return [dict(zip(STUDENT_COLS, row)) for row in cursor.fetchall()]
 
 
 def get_student_by_id(student_id):
     """Get a specific student by ID"""
     with closing(connect_db()) as conn:
-        conn.row_factory = sqlite3.Row
         cursor = conn.execute('SELECT * FROM students WHERE id = ?', (student_id,))
         row = cursor.fetchone()
-        return dict(row) if row else None
+        return dict(zip(STUDENT_COLS, row)) if row else None
 
 
 def add_student(name, email, grade):
@@ -43,6 +44,32 @@ def add_student(name, email, grade):
         return cursor.lastrowid
 
 
+def bulk_add_students(rows):
+    """Add many (name, email, grade) rows in one transaction; returns the count"""
+    rows = [(name, email, int(grade)) for name, email, grade in rows]
+    if not all(0 <= grade <= 100 for _, _, grade in rows):
+        raise ValueError("Grade must be between 0 and 100")
+
+    # One connection and one commit for the whole batch; a failing row
+    # (e.g. a duplicate email) rolls the entire import back
+    with closing(connect_db()) as conn:
+        conn.executemany(
+            'INSERT INTO students (name, email, grade) VALUES (?, ?, ?)',
+            rows
+        )
+        conn.commit()
+        return len(rows)
+
+
+def read_students_csv(path):
+    """Read name,email,grade rows from a CSV file, skipping a header row"""
+    with open(path, newline='') as f:
+        rows = [[field.strip() for field in row] for row in csv.reader(f) if row]
+    if rows and rows[0][-1].lower() == 'grade':
+        rows = rows[1:]
+    return rows
+
+
 def update_student(student_id, name, email, grade):
     """Update an existing student"""
     if not (0 <= grade <= 100):
@@ -68,32 +95,30 @@ def delete_student(student_id):
 def get_statistics():
     """Get grade statistics"""
     with closing(connect_db()) as conn:
-        conn.row_factory = sqlite3.Row
         cursor = conn.execute('''
             SELECT
                 COUNT(*) as total_students,
                 AVG(grade) as average_grade,
                 MAX(grade) as highest_grade,
                 MIN(grade) as lowest_grade,
-                COUNT(CASE WHEN grade >= 90 THEN 1 END) as a_students,
-                COUNT(CASE WHEN grade >= 80 AND grade < 90 THEN 1 END) as b_students,
-                COUNT(CASE WHEN grade >= 70 AND grade < 80 THEN 1 END) as c_students,
-                COUNT(CASE WHEN grade < 70 THEN 1 END) as failing_students
+                IFNULL(SUM(grade >= 90), 0) as a_students,
+                IFNULL(SUM(grade >= 80 AND grade < 90), 0) as b_students,
+                IFNULL(SUM(grade >= 70 AND grade < 80), 0) as c_students,
+                IFNULL(SUM(grade < 70), 0) as failing_students
             FROM students
         ''')
         row = cursor.fetchone()
-        return dict(row) if row else None
+        return dict(zip(STATS_COLS, row)) if row else None
 
 
 def filter_students_by_grade(min_grade):
     """Get students with grade >= min_grade"""
     with closing(connect_db()) as conn:
-        conn.row_factory = sqlite3.Row
         cursor = conn.execute(
             'SELECT * FROM students WHERE grade >= ? ORDER BY grade DESC',
             (min_grade,)
         )
-        return [dict(row) for row in cursor.fetchall()]
+        return [dict(zip(STUDENT_COLS, row)) for row in cursor.fetchall()]
 
 
 def print_student(student):
@@ -115,12 +140,15 @@ def print_students_table(students):
         print("\nNo students found.")
         return
 
-    print("\n" + "="*70)
-    print(f"{'ID':<5} {'Name':<20} {'Email':<25} {'Grade':<5}")
-    print("="*70)
-    for student in students:
-        print(f"{student['id']:<5} {student['name']:<20} {student['email']:<25} {student['grade']:<5}")
-    print("="*70)
+    # Build the whole table first and write it out in one call
+    fmt = "{:<5} {:<20} {:<25} {:<5}"
+    rule = "="*70
+    lines = ["", rule, fmt.format('ID', 'Name', 'Email', 'Grade'), rule]
+    lines.extend(
+        fmt.format(s['id'], s['name'], s['email'], s['grade']) for s in students
+    )
+    lines.append(rule)
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def print_statistics(stats):
@@ -161,8 +189,9 @@ def main():
         print("6. Update student")
         print("7. Delete student")
         print("8. Exit")
+        print("9. Import CSV")
 
-        choice = input("\nEnter your choice (1-8): ").strip()
+        choice = input("\nEnter your choice (1-9): ").strip()
 
         try:
             if choice == '1':
@@ -223,6 +252,11 @@ def main():
                 print("\nGoodbye!")
                 break
 
+            elif choice == '9':
+                path = input("Enter CSV file path (name,email,grade): ").strip()
+                count = bulk_add_students(read_students_csv(path))
+                print(f"\n✓ Imported {count} students")
+
             else:
                 print("\n✗ Invalid choice. Please try again.")
 